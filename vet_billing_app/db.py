@@ -2,19 +2,34 @@
 import sqlite3
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 
 APP_DIR = Path(__file__).resolve().parent
 DATA_DIR = APP_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
 DB_PATH = DATA_DIR / "vetsone.db"
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+def get_conn(readonly: bool = False):
+    if readonly:
+        conn = sqlite3.connect(f"{DB_PATH.as_uri()}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
+class _DisplayedSum:
+    """SUM() of line totals the way the app totals them: each row rounded to 2dp as shown on screen."""
+    def __init__(self):
+        self.s = 0.0
+
+    def step(self, value):
+        if value is not None:
+            self.s += float(f"{value:.2f}")
+
+    def finalize(self):
+        return float(f"{self.s:.2f}")
+
 def init_db():
+    DATA_DIR.mkdir(exist_ok=True)
     with get_conn() as conn:
         c = conn.cursor()
         c.execute(
@@ -48,6 +63,7 @@ def init_db():
             )
             '''
         )
+        c.execute('CREATE INDEX IF NOT EXISTS idx_items_invoice_id ON items(invoice_id)')
         conn.commit()
 
 def save_invoice(inv: Dict[str, Any], items: List[Dict[str, Any]]):
@@ -88,3 +104,26 @@ def get_invoice_by_receipt(receipt_no: str):
         c.execute('SELECT * FROM items WHERE invoice_id = ? ORDER BY id', (inv["id"],))
         items = [dict(r) for r in c.fetchall()]
         return inv, items
+
+def iter_invoices_with_item_totals(batch_size: int = 1000):
+    """Stream invoices ordered by receipt_no (read-only), each with items_total summed as the app does."""
+    with get_conn(readonly=True) as conn:
+        conn.create_aggregate("displayed_sum", 1, _DisplayedSum)
+        c = conn.cursor()
+        c.execute(
+            '''SELECT inv.*,
+                      (SELECT displayed_sum(line_total) FROM items WHERE items.invoice_id = inv.id) AS items_total
+               FROM invoices AS inv
+               ORDER BY inv.receipt_no'''
+        )
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows: break
+            for r in rows:
+                yield dict(r)
+
+def update_pdf_paths(updates: List[Tuple[str, int]]):
+    """Set pdf_path for many invoices in one transaction; updates are (pdf_path, invoice_id) pairs."""
+    with get_conn() as conn:
+        conn.executemany('UPDATE invoices SET pdf_path = ? WHERE id = ?', updates)
+        conn.commit()
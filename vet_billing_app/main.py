@@ -386,14 +386,19 @@ class InvoiceApp(tk.Tk):
             if not cur: return
             vals = tv.item(cur)["values"]
             path = vals[4]
-            if os.path.exists(path):
-                os.startfile(path) if os.name == "nt" else os.system(f'xdg-open "{path}"')
+            if not os.path.exists(path):
+                messagebox.showerror("PDF not found", f"{path}\n\nRun reconcile.py --repair to regenerate it.", parent=win)
+                return
+            os.startfile(path) if os.name == "nt" else os.system(f'xdg-open "{path}"')
 
         def print_selected():
             cur = tv.focus()
             if not cur: return
             vals = tv.item(cur)["values"]
             path = vals[4]
+            if not os.path.exists(path):
+                messagebox.showerror("PDF not found", f"{path}\n\nRun reconcile.py --repair to regenerate it.", parent=win)
+                return
             ok, err = print_pdf(path)
             if not ok:
                 messagebox.showerror("Print Error", err)
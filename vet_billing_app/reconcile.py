@@ -0,0 +1,199 @@
+"""
+Check that invoice PDFs on disk and invoice rows in the database agree.
+
+Reports:
+- missing      — DB row whose pdf_path doesn't exist and with no PDF under invoices/YYYY/MM/
+- relocated    — pdf_path doesn't exist, but the PDF was found under invoices/YYYY/MM/
+- orphaned     — PDF with no DB row (or a second copy of an existing receipt)
+- inconsistent — stored total differs from the sum of the invoice's items
+
+Usage:
+    python reconcile.py            # report only; the database is opened read-only
+    python reconcile.py --repair   # regenerate missing PDFs, fix stale pdf_path values
+"""
+import argparse
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+from db import APP_DIR, DB_PATH, get_invoice_by_receipt, iter_invoices_with_item_totals, update_pdf_paths
+
+INVOICE_DIR = APP_DIR / "invoices"
+LOGO_PATH = APP_DIR / "assets" / "logo.png"
+# .../YYYY/MM/<receipt>.pdf, with either path separator (pdf_path may come from a Windows machine)
+YEAR_MONTH_RE = re.compile(r"(\d{4})[\\/](\d{2})[\\/][^\\/]+$")
+
+def _same_path_key(path: str) -> str:
+    # Comparison key only; never store it (normcase lowercases the whole path on Windows)
+    return os.path.normcase(os.path.abspath(path))
+
+def _subdirs(path: str, digits: int) -> List[str]:
+    # Only YYYY (digits=4) or MM (digits=2) folders, so stray folders don't produce false orphans
+    try:
+        with os.scandir(path) as it:
+            return [e.path for e in it
+                    if len(e.name) == digits and e.name.isdigit() and e.is_dir(follow_symlinks=False)]
+    except OSError:
+        return []
+
+def _year_dirs(path: str) -> List[str]:
+    return _subdirs(path, 4)
+
+def _month_dirs(path: str) -> List[str]:
+    return _subdirs(path, 2)
+
+def _scan_month(path: str) -> List[tuple]:
+    # Only names are needed, so no stat() per file beyond what scandir gives for free
+    out = []
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                name = e.name
+                if name[-4:].lower() == ".pdf" and e.is_file():
+                    out.append((name[:-4], os.path.abspath(e.path)))
+    except OSError:
+        pass
+    return out
+
+def scan_pdfs(root=INVOICE_DIR, workers: Optional[int] = None) -> List[tuple]:
+    """Return (receipt_no, path) for every PDF in root/YYYY/MM/, sorted by receipt_no."""
+    root = str(root)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        month_dirs = [d for months in pool.map(_month_dirs, _year_dirs(root)) for d in months]
+        files = [f for batch in pool.map(_scan_month, month_dirs) for f in batch]
+    files.sort()
+    return files
+
+def reconcile(root=INVOICE_DIR, workers: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Merge-join the sorted PDF listing against invoice rows streamed in receipt_no order."""
+    report = {"missing": [], "relocated": [], "orphaned": [], "inconsistent": []}
+    files = scan_pdfs(root, workers)
+    n, i = len(files), 0
+
+    for inv in iter_invoices_with_item_totals():
+        key = inv["receipt_no"] or ""
+
+        # items_total is already rounded per row like the app's on-screen total, so compare exact cents
+        if f"{inv['total'] or 0.0:.2f}" != f"{inv['items_total'] or 0.0:.2f}":
+            report["inconsistent"].append({
+                "id": inv["id"], "receipt_no": key,
+                "total": inv["total"] or 0.0, "items_total": inv["items_total"] or 0.0,
+            })
+
+        # Files sorting before this key have no row (NULL/empty receipts sort first, so this holds for them too)
+        while i < n and files[i][0] < key:
+            report["orphaned"].append({"receipt_no": files[i][0], "path": files[i][1]})
+            i += 1
+        matches = []
+        while key and i < n and files[i][0] == key:
+            matches.append(files[i][1])
+            i += 1
+
+        stored = inv["pdf_path"]
+        stored_key = _same_path_key(stored) if stored else None
+        found = next((p for p in matches if _same_path_key(p) == stored_key), None)
+        if found is None:
+            if stored and os.path.exists(stored):
+                # Open/Print work; the file just lives outside the scanned tree. Copies inside it are extras.
+                found = stored
+            elif matches:
+                found = matches[0]
+                report["relocated"].append({"id": inv["id"], "receipt_no": key, "pdf_path": stored, "found": found})
+            else:
+                report["missing"].append({"id": inv["id"], "receipt_no": key, "date": inv["date"], "pdf_path": stored})
+        for p in matches:
+            if p is not found:
+                report["orphaned"].append({"receipt_no": key, "path": p})
+
+    for key, path in files[i:]:
+        report["orphaned"].append({"receipt_no": key, "path": path})
+    return report
+
+def _regen_path(inv: Dict[str, Any], root=INVOICE_DIR):
+    # The app files a PDF under the month it was saved in, which the stored pdf_path still records.
+    # Without one, fall back to the invoice date, which is only usable if it starts "YYYY-MM".
+    m = YEAR_MONTH_RE.search(inv.get("pdf_path") or "")
+    if m:
+        year, month = m.groups()
+    else:
+        date = inv.get("date") or ""
+        year, month = date[:4], date[5:7]
+        if not (year.isdigit() and date[4:5] == "-" and month.isdigit()):
+            raise ValueError(f"cannot derive YYYY/MM from pdf_path or date {date!r}")
+    return os.path.join(str(root), year, month, f"{inv['receipt_no']}.pdf")
+
+def repair(report: Dict[str, List[Dict[str, Any]]], root=INVOICE_DIR):
+    """Regenerate missing PDFs under root and point stale pdf_path values at the file found on disk.
+
+    Orphaned and inconsistent records are left alone: there is no row to rebuild an
+    orphan from, and which of total/items is right needs a human decision. Existing
+    files are never overwritten.
+    Returns (number of records repaired, list of error messages).
+    """
+    errors = []
+    repaired = 0
+    relocations = [(r["found"], r["id"]) for r in report["relocated"]]
+    if relocations:
+        try:
+            update_pdf_paths(relocations)
+            repaired += len(relocations)
+        except Exception as e:
+            errors.append(f"updating pdf_path for {len(relocations)} relocated invoices: {e}")
+    if not report["missing"]:
+        return repaired, errors
+
+    from invoice_pdf import create_invoice_pdf  # needs reportlab; report-only runs don't
+    regenerated = []
+    for r in report["missing"]:
+        try:
+            if not r["receipt_no"]:
+                raise ValueError("invoice has no receipt number")
+            inv, items = get_invoice_by_receipt(r["receipt_no"])
+            path = _regen_path(inv, root)
+            if os.path.exists(path):
+                raise FileExistsError(f"{path} already exists, not overwriting")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            create_invoice_pdf(path, inv, items, logo_path=str(LOGO_PATH))
+            regenerated.append((os.path.abspath(path), inv["id"]))
+        except Exception as e:
+            errors.append(f"{r['receipt_no'] or '#' + str(r['id'])}: {e}")
+    if regenerated:
+        try:
+            update_pdf_paths(regenerated)
+            repaired += len(regenerated)
+        except Exception as e:
+            errors.append(f"updating pdf_path for {len(regenerated)} regenerated PDFs: {e}")
+    return repaired, errors
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reconcile invoice PDFs with the billing database.")
+    ap.add_argument("--repair", action="store_true", help="regenerate missing PDFs and fix stale pdf_path values")
+    ap.add_argument("--root", default=str(INVOICE_DIR), help="invoice folder to scan (default: %(default)s)")
+    ap.add_argument("--workers", type=int, default=None, help="threads used to scan folders")
+    args = ap.parse_args(argv)
+
+    if not DB_PATH.exists():
+        print(f"database not found: {DB_PATH}")
+        return 1
+    report = reconcile(args.root, args.workers)
+    for r in report["missing"]:
+        print(f"MISSING       {r['receipt_no'] or '#' + str(r['id'])}  (pdf_path: {r['pdf_path'] or '—'})")
+    for r in report["relocated"]:
+        print(f"RELOCATED     {r['receipt_no']}  {r['pdf_path'] or '—'} -> {r['found']}")
+    for r in report["orphaned"]:
+        print(f"ORPHANED      {r['path']}")
+    for r in report["inconsistent"]:
+        print(f"INCONSISTENT  {r['receipt_no']}  total {r['total']:.2f} != items {r['items_total']:.2f}")
+    print(", ".join(f"{k}: {len(v)}" for k, v in report.items()))
+
+    if args.repair and (report["missing"] or report["relocated"]):
+        repaired, errors = repair(report, args.root)
+        for e in errors:
+            print(f"REPAIR FAILED {e}")
+        print(f"repaired: {repaired}")
+        return 1 if errors or report["orphaned"] or report["inconsistent"] else 0
+    return 1 if any(report.values()) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())